@@ -15,6 +15,8 @@ md2doc.py
 用法:
   python md2doc.py input.md -o output.docx
   python md2doc.py input.md -o output.doc
+  python md2doc.py input.md -o output.doc --fast-doc   # 不调用 LibreOffice，.docx 直接改名为 .doc
+  python md2doc.py a.md b.md c.md -o out_dir   # 批量转换
 
 依赖（见 requirements.txt）:
   - pypandoc (可选，但建议，需系统安装 pandoc)
@@ -25,100 +27,460 @@ md2doc.py
 from __future__ import annotations
 
 import argparse
+import atexit
+import copy
+import functools
+import hashlib
+import json
+import mmap
 import os
+import pickle
+import re
 import shutil
+import stat
 import subprocess
 import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple, Union
+from urllib.parse import unquote
 import tempfile
 
+# 重依赖在模块加载时导入一次，避免每次转换重复执行 import 语句；缺失时在用到的地方再报错
+try:
+    import docx
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import parse_xml
+    from docx.shared import Pt, Mm
+    from lxml.etree import SubElement
+except ImportError:
+    docx = None
+try:
+    import markdown_it
+    from markdown_it import MarkdownIt
+except ImportError:
+    markdown_it = None
+
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+# 缓存格式版本：渲染逻辑变化时递增，使旧缓存自动失效
+_CACHE_VERSION = "1"
+# 缓存目录总大小上限；超出时按最近使用时间（mtime）从旧到新删除
+_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 
 def which(cmd: str) -> Optional[str]:
     return shutil.which(cmd)
 
 
-def ensure_parent_dir(path: str) -> None:
-    parent = os.path.dirname(os.path.abspath(path))
-    if parent and not os.path.exists(parent):
-        os.makedirs(parent, exist_ok=True)
+@functools.lru_cache(maxsize=1)
+def _pandoc() -> Optional[Tuple[str, str]]:
+    """探测一次 pandoc，返回 (路径, 版本)；pypandoc 或 pandoc 不可用时为 None。"""
+    try:
+        import pypandoc  # type: ignore
+    except Exception:
+        return None
+    if not which("pandoc"):
+        return None
+    try:
+        return pypandoc.get_pandoc_path(), pypandoc.get_pandoc_version()
+    except Exception:
+        return None
 
 
-def _apply_doc_defaults(doc, header_text: Optional[str], cfg: Optional[Dict[str, Any]] = None) -> None:
-    from docx.shared import Pt, Mm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.oxml.ns import qn
+@functools.lru_cache(maxsize=1)
+def _soffice() -> Optional[str]:
+    return which("soffice") or which("libreoffice")
+
+
+def ensure_parent_dir(path: StrPath) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def _cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "md2doc")
+
+
+def _cache_key(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in (_CACHE_VERSION,) + parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cache_path(key: str, suffix: str) -> str:
+    return os.path.join(_cache_dir(), key + suffix)
+
+
+def _cache_touch(path: str) -> None:
+    # 命中时刷新 mtime，使清理按最近使用而非创建时间淘汰
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _cache_read(key: str, suffix: str) -> Optional[bytes]:
+    path = _cache_path(key, suffix)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    _cache_touch(path)
+    return data
+
+
+def _cache_write(key: str, suffix: str, data: bytes) -> None:
+    # 先写临时文件再原子替换，避免并发或中断时留下半截缓存；缓存失败不影响转换
+    path = _cache_path(key, suffix)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _cache_prune(max_bytes: int = _CACHE_MAX_BYTES) -> None:
+    entries = []
+    total = 0
+    try:
+        with os.scandir(_cache_dir()) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+    except OSError:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _cfg_key(header_text: Optional[str], cfg: Optional[Dict[str, Any]]) -> str:
+    return json.dumps([header_text, cfg or {}], sort_keys=True, ensure_ascii=False, default=str)
+
+
+_MD: Optional[Any] = None
+
+
+def _get_md():
+    """进程内共享的解析器：规则表只构建一次；MarkdownIt.parse 不在调用之间保留状态。"""
+    global _MD
+    if _MD is None:
+        _MD = MarkdownIt("commonmark").enable("table").enable("strikethrough")
+    return _MD
+
+
+def _parse_markdown(data, use_cache: bool = True) -> Tuple[Any, ...]:
+    """解析 UTF-8 编码的 Markdown 为 token 序列；以 ~/.cache/md2doc 磁盘缓存复用解析结果。
+
+    以内容摘要为键，命中缓存时无需解码；源文本只在解析期间存活。
+    token 序列远大于源文本，进程内不再保留，渲染完即可释放。
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    tokens = None
+    key = _cache_key("tokens", digest, markdown_it.__version__, "commonmark+table+strikethrough")
+    if use_cache:
+        blob = _cache_read(key, ".pkl")
+        if blob is not None:
+            try:
+                tokens = tuple(pickle.loads(blob))
+            except Exception:
+                tokens = None
+
+    if tokens is None:
+        tokens = tuple(_get_md().parse(str(data, "utf-8")))
+        if use_cache:
+            _cache_write(key, ".pkl", pickle.dumps(list(tokens), protocol=pickle.HIGHEST_PROTOCOL))
+    return tokens
+
+
+def _read_tokens(input_path: StrPath, use_cache: bool = True) -> Tuple[Any, ...]:
+    # mmap 由内核按需分页，摘要直接在映射上计算，避免先整体读入再编码一次；
+    # 管道等非普通文件无法映射且 st_size 恒为 0，直接读取
+    with open(input_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            return _parse_markdown(f.read(), use_cache)
+        if st.st_size == 0:
+            return _parse_markdown(b"", use_cache)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return _parse_markdown(buf, use_cache)
+
+
+# 带协议的地址（http:、https:、file: 等）；至少两个字符，以免把 Windows 盘符当作协议
+_URL_SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]+:")
+
+
+def _resource_digest(tokens) -> Optional[str]:
+    """pandoc 会嵌入文档的本地图片的内容摘要；引用远程或无法读取的图片时返回 None。
 
-    cfg = cfg or {}
-    page = cfg.get("page", {})
-    margins = cfg.get("margins", {})
-    normal_style = cfg.get("normal", {})
-    headings = cfg.get("headings", {})
-    header_cfg = cfg.get("header", {})
+    相对路径与 pandoc 一样按当前工作目录解析；data: 内联图片已包含在 Markdown 中，无需计入。
+    """
+    h = hashlib.sha256()
+    for tok in tokens:
+        for child in tok.children or ():
+            if child.type != "image":
+                continue
+            src = str(child.attrGet("src") or "")
+            if src.startswith("data:"):
+                continue
+            if _URL_SCHEME_RE.match(src):
+                return None
+            # markdown-it 会对链接做百分号编码，还原为文件路径
+            path = unquote(src)
+            try:
+                with open(path, "rb") as f:
+                    h.update(path.encode("utf-8", "surrogateescape") + b"\0")
+                    h.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                return None
+    return h.hexdigest()
+
+
+# 携带可见文本的行内 token 类型（softbreak/hardbreak 的 content 为空，不计入）
+_TEXT_TYPES = frozenset({"text", "code_inline", "html_inline", "image"})
+
+
+def _inline_text(inline) -> str:
+    if not inline.children:
+        return ""
+    return "".join([c.content for c in inline.children if c.type in _TEXT_TYPES])
+
+
+def _match_close(tokens) -> List[int]:
+    """一次线性扫描，得到每个 *_open token 对应 *_close 的下标（非开标签为 -1）。"""
+    close = [-1] * len(tokens)
+    stack: List[int] = []
+    for idx, tok in enumerate(tokens):
+        if tok.nesting == 1:
+            stack.append(idx)
+        elif tok.nesting == -1 and stack:
+            close[stack.pop()] = idx
+    return close
+
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_P = f"{{{_W_NS}}}p"
+_W_PPR = f"{{{_W_NS}}}pPr"
+_W_PSTYLE = f"{{{_W_NS}}}pStyle"
+_W_R = f"{{{_W_NS}}}r"
+_W_RPR = f"{{{_W_NS}}}rPr"
+_W_RFONTS = f"{{{_W_NS}}}rFonts"
+_W_T = f"{{{_W_NS}}}t"
+_W_BR = f"{{{_W_NS}}}br"
+_W_TAB = f"{{{_W_NS}}}tab"
+_W_SECT_PR = f"{{{_W_NS}}}sectPr"
+_W_VAL = f"{{{_W_NS}}}val"
+_W_ASCII = f"{{{_W_NS}}}ascii"
+_W_HANSI = f"{{{_W_NS}}}hAnsi"
+_W_EAST_ASIA = f"{{{_W_NS}}}eastAsia"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+# 列表项段落的固定结构：行距固定 20 磅（400 twips）；文本 run 由 _w_r 追加，
+# 以便 \t/\n 转为 <w:tab/>/<w:br/>，而不是留在 <w:t> 中
+_LI_TEMPLATE = (
+    f'<w:p xmlns:w="{_W_NS}"><w:pPr><w:spacing w:line="400" w:lineRule="exact"/></w:pPr></w:p>'
+)
+_BREAK_RE = re.compile(r"([\t\n])")
+
+
+def _w_p(body, style_id: Optional[str] = None):
+    """在 body 末尾直接追加 <w:p>，绕过 python-docx 的对象模型。"""
+    p = SubElement(body, _W_P)
+    if style_id:
+        SubElement(SubElement(p, _W_PPR), _W_PSTYLE).set(_W_VAL, style_id)
+    return p
+
+
+def _w_r(p, text: str, font: Optional[str] = None):
+    r = SubElement(p, _W_R)
+    if font:
+        fonts = SubElement(SubElement(r, _W_RPR), _W_RFONTS)
+        fonts.set(_W_ASCII, font)
+        fonts.set(_W_HANSI, font)
+    # 与 python-docx 的 run.text 一致：\n 转为 <w:br/>，\t 转为 <w:tab/>
+    for piece in _BREAK_RE.split(text):
+        if piece == "\n":
+            SubElement(r, _W_BR)
+        elif piece == "\t":
+            SubElement(r, _W_TAB)
+        elif piece:
+            t = SubElement(r, _W_T)
+            t.text = piece
+            if piece[0].isspace() or piece[-1].isspace():
+                t.set(_XML_SPACE, "preserve")
+    return r
+
+
+# 配置中的对齐名（CENTER/LEFT/RIGHT/JUSTIFY…）到枚举值
+_ALIGN_MAP: Dict[str, Any] = {m.name: m for m in WD_ALIGN_PARAGRAPH} if docx is not None else {}
+
+
+def _require_docx() -> None:
+    if docx is None:
+        raise RuntimeError("缺少 python-docx，请安装：pip install python-docx")
+
+
+@dataclass(frozen=True, slots=True)
+class HeadingStyle:
+    name: str
+    family: str
+    size_pt: float
+    align: Any
+    space_before_pt: float
+    space_after_pt: float
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedStyle:
+    """把样式配置（含默认值）一次性解析为扁平字段，应用时只做属性访问。"""
+
+    page_w_mm: float
+    page_h_mm: float
+    top_mm: float
+    bottom_mm: float
+    left_mm: float
+    right_mm: float
+    chinese: str
+    western: str
+    size_pt: float
+    line_spacing_pt: float
+    headings: Tuple[HeadingStyle, ...]
+    header_text: Optional[str]
+    header_family: str
+    header_size_pt: float
+
+    @classmethod
+    def from_cfg(cls, cfg: Optional[Dict[str, Any]]) -> "ResolvedStyle":
+        # 一次运行只用一份配置：只记住最近一组 (cfg, style)，不随调用次数增长。
+        # 主进程中 cfg 是同一个对象，按身份即可命中；工作进程每个任务收到的是反序列化出的
+        # 新字典，再按内容比较（字典 == 在 C 中逐项比较，远比序列化便宜）
+        global _STYLE_LAST
+        hit = _STYLE_LAST
+        if hit is not None and (hit[0] is cfg or hit[0] == cfg):
+            return hit[1]
+        style = cls._resolve(cfg or {})
+        _STYLE_LAST = (cfg, style)
+        return style
+
+    @classmethod
+    def _resolve(cls, cfg: Dict[str, Any]) -> "ResolvedStyle":
+        page = cfg.get("page") or {}
+        margins = cfg.get("margins") or {}
+        normal_style = cfg.get("normal") or {}
+        headings = cfg.get("headings") or {}
+        header_cfg = cfg.get("header") or {}
+        chinese = normal_style.get("chinese", "SimSun")
+
+        def heading(name: str, size_pt: float, align: str) -> HeadingStyle:
+            h = headings.get(name) or {}
+            return HeadingStyle(
+                name=name,
+                family=h.get("family", "SimHei"),
+                size_pt=h.get("size_pt", size_pt),
+                align=_ALIGN_MAP.get(h.get("align", align), _ALIGN_MAP.get(align)),
+                space_before_pt=h.get("space_before_pt", 12),
+                space_after_pt=h.get("space_after_pt", 12),
+            )
+
+        return cls(
+            page_w_mm=page.get("width_mm", 210),
+            page_h_mm=page.get("height_mm", 297),
+            top_mm=margins.get("top_mm", 30),
+            bottom_mm=margins.get("bottom_mm", 25),
+            left_mm=margins.get("left_mm", 30),
+            right_mm=margins.get("right_mm", 25),
+            chinese=chinese,
+            western=normal_style.get("western", "Times New Roman"),
+            size_pt=normal_style.get("size_pt", 12),
+            line_spacing_pt=normal_style.get("line_spacing_pt", 20),
+            headings=(
+                heading("Heading 1", 16, "CENTER"),
+                heading("Heading 2", 14, "LEFT"),
+                heading("Heading 3", 12, "LEFT"),
+            ),
+            header_text=header_cfg.get("text"),
+            header_family=header_cfg.get("family", chinese),
+            header_size_pt=header_cfg.get("size_pt", 9),
+        )
+
+
+_STYLE_LAST: Optional[Tuple[Optional[Dict[str, Any]], ResolvedStyle]] = None
+
+
+def _apply_doc_defaults(doc, header_text: Optional[str], cfg: Optional[Dict[str, Any]] = None) -> None:
+    style = ResolvedStyle.from_cfg(cfg)
 
     # 页面设置 A4 与页边距
     section = doc.sections[0]
-    section.page_width = Mm(page.get("width_mm", 210))
-    section.page_height = Mm(page.get("height_mm", 297))
-    section.top_margin = Mm(margins.get("top_mm", 30))
-    section.bottom_margin = Mm(margins.get("bottom_mm", 25))
-    section.left_margin = Mm(margins.get("left_mm", 30))
-    section.right_margin = Mm(margins.get("right_mm", 25))
+    section.page_width = Mm(style.page_w_mm)
+    section.page_height = Mm(style.page_h_mm)
+    section.top_margin = Mm(style.top_mm)
+    section.bottom_margin = Mm(style.bottom_mm)
+    section.left_margin = Mm(style.left_mm)
+    section.right_margin = Mm(style.right_mm)
 
     # 正文 Normal 样式：宋体/Times New Roman，小四，行距 20 磅
     normal = doc.styles["Normal"]
-    normal.font.size = Pt(normal_style.get("size_pt", 12))
-    normal.font.name = normal_style.get("chinese", "SimSun")
+    normal.font.size = Pt(style.size_pt)
+    normal.font.name = style.chinese
     # East Asia 字体指定
     if hasattr(normal, "_element"):
         rpr = normal._element.rPr
         if rpr is not None and rpr.rFonts is not None:
-            rpr.rFonts.set(qn('w:eastAsia'), normal_style.get("chinese", "SimSun"))
-            rpr.rFonts.set(qn('w:ascii'), normal_style.get("western", "Times New Roman"))
-            rpr.rFonts.set(qn('w:hAnsi'), normal_style.get("western", "Times New Roman"))
+            rpr.rFonts.set(_W_EAST_ASIA, style.chinese)
+            rpr.rFonts.set(_W_ASCII, style.western)
+            rpr.rFonts.set(_W_HANSI, style.western)
     # 行距设置
-    for s in [normal]:
-        if hasattr(s, "paragraph_format"):
-            s.paragraph_format.line_spacing = Pt(normal_style.get("line_spacing_pt", 20))
+    if hasattr(normal, "paragraph_format"):
+        normal.paragraph_format.line_spacing = Pt(style.line_spacing_pt)
 
     # 标题样式
-    def cfg_heading(name: str, size_pt: int, align: int, family: str):
-        st = doc.styles[name]
-        st.font.name = family
-        st.font.size = Pt(size_pt)
+    for h in style.headings:
+        st = doc.styles[h.name]
+        st.font.name = h.family
+        st.font.size = Pt(h.size_pt)
         if hasattr(st, "paragraph_format"):
-            st.paragraph_format.alignment = align
-            st.paragraph_format.space_before = Pt(headings.get(name, {}).get("space_before_pt", 12))
-            st.paragraph_format.space_after = Pt(headings.get(name, {}).get("space_after_pt", 12))
-
-    cfg_heading("Heading 1", headings.get("Heading 1", {}).get("size_pt", 16),
-                WD_ALIGN_PARAGRAPH.__dict__.get(headings.get("Heading 1", {}).get("align", "CENTER"), WD_ALIGN_PARAGRAPH.CENTER),
-                headings.get("Heading 1", {}).get("family", "SimHei"))
-    cfg_heading("Heading 2", headings.get("Heading 2", {}).get("size_pt", 14),
-                WD_ALIGN_PARAGRAPH.__dict__.get(headings.get("Heading 2", {}).get("align", "LEFT"), WD_ALIGN_PARAGRAPH.LEFT),
-                headings.get("Heading 2", {}).get("family", "SimHei"))
-    cfg_heading("Heading 3", headings.get("Heading 3", {}).get("size_pt", 12),
-                WD_ALIGN_PARAGRAPH.__dict__.get(headings.get("Heading 3", {}).get("align", "LEFT"), WD_ALIGN_PARAGRAPH.LEFT),
-                headings.get("Heading 3", {}).get("family", "SimHei"))
+            st.paragraph_format.alignment = h.align
+            st.paragraph_format.space_before = Pt(h.space_before_pt)
+            st.paragraph_format.space_after = Pt(h.space_after_pt)
 
     # 页眉页脚
     header = section.header
-    if header_text or header_cfg.get("text"):
-        header_text = header_text or header_cfg.get("text")
+    header_text = header_text or style.header_text
+    if header_text:
         p = header.paragraphs[0] if header.paragraphs else header.add_paragraph()
         run = p.add_run(header_text)
-        run.font.name = header_cfg.get("family", normal_style.get("chinese", "SimSun"))
-        run.font.size = Pt(header_cfg.get("size_pt", 9))
+        run.font.name = style.header_family
+        run.font.size = Pt(style.header_size_pt)
     footer = section.footer
     if footer and footer.paragraphs:
         for p in footer.paragraphs:
             for r in p.runs:
-                r.font.name = header_cfg.get("family", normal_style.get("chinese", "SimSun"))
-                r.font.size = Pt(header_cfg.get("size_pt", 9))
+                r.font.name = style.header_family
+                r.font.size = Pt(style.header_size_pt)
 
 
 def _create_reference_docx(path: str, header_text: Optional[str], cfg: Optional[Dict[str, Any]]) -> None:
-    from docx import Document
+    _require_docx()
     doc = Document()
     _apply_doc_defaults(doc, header_text, cfg)
     # 放一个空段落，确保样式写入
@@ -126,291 +488,559 @@ def _create_reference_docx(path: str, header_text: Optional[str], cfg: Optional[
     doc.save(path)
 
 
-def convert_with_pandoc(input_path: str, output_path: str, header_text: Optional[str], cfg: Optional[Dict[str, Any]]) -> bool:
-    try:
-        import pypandoc  # type: ignore
-    except Exception:
-        return False
-    if not which("pandoc"):
+# 每个进程内按 (页眉, 配置) 只生成一次 reference.docx，放在进程级临时目录中（退出时清理）；
+# 启用缓存时还会存入 ~/.cache/md2doc，之后的运行直接复用，无需再经 python-docx 构建
+_REF_DOCX: Dict[str, str] = {}
+_REF_TMPDIR: Optional[tempfile.TemporaryDirectory] = None
+
+
+def _reference_docx(header_text: Optional[str], cfg: Optional[Dict[str, Any]], use_cache: bool = True) -> str:
+    global _REF_TMPDIR
+    key = _cfg_key(header_text, cfg)
+    path = _REF_DOCX.get(key)
+    if path is None:
+        disk_key = _cache_key("reference", key, docx.__version__ if docx is not None else "")
+        cached = _cache_path(disk_key, ".docx")
+        if use_cache and os.path.exists(cached):
+            _cache_touch(cached)
+            path = cached
+        else:
+            if _REF_TMPDIR is None:
+                _REF_TMPDIR = tempfile.TemporaryDirectory(prefix="md2doc-")
+            path = os.path.join(_REF_TMPDIR.name, f"reference-{len(_REF_DOCX)}.docx")
+            _create_reference_docx(path, header_text, cfg)
+            if use_cache:
+                with open(path, "rb") as f:
+                    _cache_write(disk_key, ".docx", f.read())
+        _REF_DOCX[key] = path
+    return path
+
+
+# commonmark_x 读取器为线性时间实现，不存在旧 markdown 读取器在原始 HTML/span 上的指数级回溯；
+# 旧读取器可用 --legacy-markdown 恢复
+PANDOC_FROM = "commonmark_x+tex_math_dollars+pipe_tables"
+PANDOC_FROM_LEGACY = "markdown+tex_math_dollars+pipe_tables+table_captions"
+# 限制 pandoc 堆内存，防止恶意或病态输入耗尽内存
+_PANDOC_RTS = ["+RTS", "-M512M", "-RTS"]
+
+
+def _run_pandoc(pandoc: str, input_path: StrPath, output_path: StrPath, extra_args: List[str],
+                stdin_data: Optional[bytes] = None) -> str:
+    """运行 pandoc 并返回其 stderr 文本；成功时的警告（如资源无法获取）转发给用户。
+
+    给出 stdin_data 时忽略 input_path，由标准输入传入内容。
+    """
+    # 直接调用 pandoc：pypandoc.convert_file 每次都会额外运行
+    # `pandoc --list-input-formats/--list-output-formats` 校验格式，批量时启动开销翻三倍
+    proc = subprocess.run(
+        [pandoc, *_PANDOC_RTS, "-" if stdin_data is not None else input_path, "--to=docx",
+         f"--output={output_path}", *extra_args],
+        input=stdin_data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    err = proc.stderr.decode("utf-8", "replace").strip()
+    if proc.returncode != 0:
+        raise RuntimeError(err or f"pandoc 退出码 {proc.returncode}")
+    if err:
+        print(f"[pandoc] {err}", file=sys.stderr)
+    return err
+
+
+def convert_with_pandoc(input_path: StrPath, output_path: StrPath, header_text: Optional[str], cfg: Optional[Dict[str, Any]],
+                        use_cache: bool = True, legacy_markdown: bool = False) -> bool:
+    probe = _pandoc()
+    if probe is None:
         return False
+    pandoc, pandoc_version = probe
     ensure_parent_dir(output_path)
     try:
-        # 生成 reference.docx 以传递版式与样式
-        with tempfile.TemporaryDirectory() as td:
-            ref_path = os.path.join(td, "reference.docx")
-            _create_reference_docx(ref_path, header_text, cfg)
-        pypandoc.convert_file(
-            source_file=input_path,
-            to="docx",
-            outputfile=output_path,
-            extra_args=[
-                "--standalone",
-                "--from=markdown+tex_math_dollars+pipe_tables+table_captions",
-                f"--reference-doc={ref_path}",
-            ],
-        )
-        return os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        extra_args = [
+            "--standalone",
+            f"--from={PANDOC_FROM_LEGACY if legacy_markdown else PANDOC_FROM}",
+        ]
+        # 以 输入内容 + 所嵌入图片的内容 + 版式配置 + 参数 + pandoc 版本 + 工作目录 为键缓存最终 docx；
+        # pandoc 按当前工作目录解析图片等相对路径资源，目录不同结果可能不同。
+        # 图片取自 markdown-it 的 token；未安装 markdown-it 或引用了远程/缺失的图片时无法确定
+        # 嵌入内容，不做输出缓存
+        # 管道等非普通文件只能读一次，且子进程无法打开 /dev/fd/N：
+        # 读出后经标准输入交给 pandoc，不做输出缓存
+        key = ""
+        stdin_data = None
+        if not os.path.isfile(input_path):
+            with open(input_path, "rb") as f:
+                stdin_data = f.read()
+        elif use_cache and markdown_it is not None:
+            with open(input_path, "rb") as f:
+                data = f.read()
+            resources = _resource_digest(_parse_markdown(data, use_cache))
+            if resources is not None:
+                key = _cache_key("pandoc", hashlib.sha256(data).hexdigest(), resources,
+                                 _cfg_key(header_text, cfg), " ".join(extra_args), pandoc_version, os.getcwd())
+            del data
+        if key:
+            cached = _cache_path(key, ".docx")
+            if os.path.exists(cached):
+                shutil.copyfile(cached, output_path)
+                _cache_touch(cached)
+                return True
+        # reference.docx 传递版式与样式
+        ref_path = _reference_docx(header_text, cfg, use_cache)
+        warnings = _run_pandoc(pandoc, input_path, output_path, extra_args + [f"--reference-doc={ref_path}"],
+                               stdin_data)
+        # pandoc 已成功退出，输出文件必然存在，只需一次 stat 检查非空
+        ok = os.stat(output_path).st_size > 0
+        # 有警告（如图片无法获取）的结果可能不完整，不写入缓存
+        if ok and key and not warnings:
+            with open(output_path, "rb") as f:
+                _cache_write(key, ".docx", f.read())
+        return ok
     except Exception as exc:
         print(f"[pandoc] 失败: {exc}", file=sys.stderr)
         return False
 
 
-def fallback_convert_with_python_docx(input_path: str, output_docx_path: str, header_text: Optional[str], cfg: Optional[Dict[str, Any]]) -> None:
-    from docx import Document  # type: ignore
-    from docx.shared import Pt
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.oxml.ns import qn
-    try:
-        from markdown_it import MarkdownIt  # type: ignore
-    except Exception as exc:
-        raise RuntimeError(
-            "缺少 markdown-it-py，请安装：pip install markdown-it-py"
-        ) from exc
+# 重复出现的行内内容（固定前缀、导航或样板段落等）只渲染一次：以 inline token 的源文本为键
+# 缓存渲染好的 <w:p>，命中时复制一份追加。源文本是现成的字符串，查表无需另建键；
+# 引用式链接的定义只在同一文档内有效，故两张表在每个文档开始时清空（见 _reset_inline_cache）。
+# 多数段落只出现一次，为其深拷贝入缓存纯属浪费：第一次出现只记下键，第二次出现才缓存
+_INLINE_CACHE_SIZE = 64
+_INLINE_CACHE: "OrderedDict[str, Any]" = OrderedDict()
+_INLINE_SEEN_SIZE = 4096
+_INLINE_SEEN: set = set()
 
-    with open(input_path, "r", encoding="utf-8") as f:
-        text = f.read()
 
-    md = MarkdownIt("commonmark").enable("table").enable("strikethrough")
-    tokens = md.parse(text)
+def _reset_inline_cache() -> None:
+    _INLINE_CACHE.clear()
+    _INLINE_SEEN.clear()
 
-    doc = Document()
-    _apply_doc_defaults(doc, header_text, cfg)
 
-    # 简易栈管理列表缩进
-    list_stack: List[dict] = []
-
-    def add_paragraph_from_inline(inline_children):
-        p = doc.add_paragraph()
-        run = None
-        for child in inline_children or []:
-            if child.type == "text":
-                run = p.add_run(child.content)
-            elif child.type == "code_inline":
-                run = p.add_run(child.content)
-                run.font.name = "Consolas"
-            elif child.type == "softbreak" or child.type == "hardbreak":
-                p.add_run("\n")
-            elif child.type == "em_open" or child.type == "em_close":
-                # 斜体在 python-docx 需要在具体 run 上设置；这里简化处理：
-                pass
-            elif child.type == "strong_open" or child.type == "strong_close":
-                pass
-            elif child.type == "link_open":
-                # 链接文本以普通文本写入
-                pass
-            elif child.type == "link_close":
-                pass
-            else:
-                if getattr(child, "content", None):
-                    run = p.add_run(child.content)
+def _inline_paragraph(body, inline):
+    key = inline.content
+    cached = _INLINE_CACHE.get(key)
+    if cached is not None:
+        _INLINE_CACHE.move_to_end(key)
+        p = copy.deepcopy(cached)
+        body.append(p)
         return p
+    p = _w_p(body)
+    for child in inline.children or []:
+        if child.type == "text":
+            _w_r(p, child.content)
+        elif child.type == "code_inline":
+            _w_r(p, child.content, "Consolas")
+        elif child.type == "softbreak" or child.type == "hardbreak":
+            _w_r(p, "\n")
+        elif child.type == "em_open" or child.type == "em_close":
+            # 斜体需要在具体 run 上设置；这里简化处理：
+            pass
+        elif child.type == "strong_open" or child.type == "strong_close":
+            pass
+        elif child.type == "link_open":
+            # 链接文本以普通文本写入
+            pass
+        elif child.type == "link_close":
+            pass
+        else:
+            if child.content:
+                _w_r(p, child.content)
+    if key in _INLINE_SEEN:
+        _INLINE_SEEN.discard(key)
+        _INLINE_CACHE[key] = copy.deepcopy(p)
+        if len(_INLINE_CACHE) > _INLINE_CACHE_SIZE:
+            _INLINE_CACHE.popitem(last=False)
+    else:
+        if len(_INLINE_SEEN) >= _INLINE_SEEN_SIZE:
+            _INLINE_SEEN.clear()
+        _INLINE_SEEN.add(key)
+    return p
 
-    i = 0
-    while i < len(tokens):
-        tok = tokens[i]
-        t = tok.type
-
-        if t == "heading_open":
-            level = int(tok.tag[-1]) if tok.tag.startswith("h") else 1
-            # 下一个应为 inline
-            inline = tokens[i + 1] if i + 1 < len(tokens) else None
-            text_content = ""
-            if inline and hasattr(inline, "children") and inline.children:
-                text_content = "".join(ch.content for ch in inline.children if getattr(ch, "content", None))
-            p = doc.add_paragraph(text_content, style=f"Heading {min(level,6)}")
-            i += 2  # 跳过 inline
-            # 跳过 heading_close
-            i += 1
-            continue
 
-        if t == "paragraph_open":
-            inline = tokens[i + 1] if i + 1 < len(tokens) else None
-            if inline and hasattr(inline, "children"):
-                p = add_paragraph_from_inline(inline.children)
-            else:
-                doc.add_paragraph("")
-            # 跳过 inline、paragraph_close
-            i += 3
-            continue
+@dataclass
+class _RenderState:
+    doc: Any
+    # 段落直接以 lxml 元素追加到 body 末尾，最后再把 sectPr 移回末尾
+    body: Any
+    # 每个 *_open token 对应 *_close 的下标，见 _match_close
+    close: List[int]
+    # 简易栈管理列表缩进
+    list_stack: List[str]
+    heading_ids: Dict[int, str]
 
-        if t in ("bullet_list_open", "ordered_list_open"):
-            list_stack.append({"type": t, "indent": len(list_stack)})
-            i += 1
-            continue
 
-        if t in ("bullet_list_close", "ordered_list_close"):
-            if list_stack:
-                list_stack.pop()
-            i += 1
-            continue
+# 以下处理函数均接收 (tokens, i, state)，渲染 tokens[i] 开始的块并返回下一个待处理下标
 
-        if t == "list_item_open":
-            # 项目内容通常为 paragraph_open -> inline -> paragraph_close
-            # 简化为读取下一段 inline 文本
-            j = i + 1
-            content_text = ""
-            while j < len(tokens) and tokens[j].type != "list_item_close":
-                if tokens[j].type == "inline" and getattr(tokens[j], "children", None):
-                    content_text = "".join(
-                        ch.content for ch in tokens[j].children if getattr(ch, "content", None)
-                    )
-                j += 1
-            bullet = "•" if list_stack and list_stack[-1]["type"] == "bullet_list_open" else "1."
-            indent = "    " * (len(list_stack) - 1)
-            para = doc.add_paragraph(f"{indent}{bullet} {content_text}")
-            # 行距保持 20 磅
-            para.paragraph_format.line_spacing = Pt(20)
-            i = j + 1
-            continue
 
-        if t == "fence":  # 代码块
-            code_text = tok.content.rstrip("\n")
-            p = doc.add_paragraph()
-            run = p.add_run(code_text)
-            run.font.name = "Consolas"
-            i += 1
-            continue
+def _handle_heading(tokens, i: int, st: _RenderState) -> int:
+    tok = tokens[i]
+    level = min(int(tok.tag[-1]) if tok.tag.startswith("h") else 1, 6)
+    # 下一个应为 inline
+    inline = tokens[i + 1] if i + 1 < len(tokens) else None
+    text_content = _inline_text(inline) if inline is not None and inline.type == "inline" else ""
+    if level not in st.heading_ids:
+        st.heading_ids[level] = st.doc.styles[f"Heading {level}"].style_id
+    p = _w_p(st.body, st.heading_ids[level])
+    if text_content:
+        _w_r(p, text_content)
+    # 跳过 inline、heading_close
+    return st.close[i] + 1
 
-        if t == "blockquote_open":
-            # 简化：为引用增加前缀
-            j = i + 1
-            quote_lines: List[str] = []
-            while j < len(tokens) and tokens[j].type != "blockquote_close":
-                if tokens[j].type == "inline" and getattr(tokens[j], "content", None):
-                    quote_lines.append(tokens[j].content)
-                j += 1
-            for line in quote_lines:
-                doc.add_paragraph(f"> {line}")
-            i = j + 1
-            continue
 
-        if t == "hr":
-            doc.add_paragraph("——————")
-            i += 1
-            continue
+def _handle_paragraph(tokens, i: int, st: _RenderState) -> int:
+    inline = tokens[i + 1] if i + 1 < len(tokens) else None
+    if inline and hasattr(inline, "children"):
+        _inline_paragraph(st.body, inline)
+    else:
+        _w_p(st.body)
+    # 跳过 inline、paragraph_close
+    return st.close[i] + 1
+
+
+def _handle_list_open(tokens, i: int, st: _RenderState) -> int:
+    st.list_stack.append(tokens[i].type)
+    return i + 1
+
+
+def _handle_list_close(tokens, i: int, st: _RenderState) -> int:
+    if st.list_stack:
+        st.list_stack.pop()
+    return i + 1
+
+
+def _handle_list_item(tokens, i: int, st: _RenderState) -> int:
+    # 项目内容通常为 paragraph_open -> inline -> paragraph_close
+    # 只取项目自身的首段文本；其后的嵌套列表等内容交回主循环处理
+    content_text = ""
+    j = i
+    if i + 1 < len(tokens) and tokens[i + 1].type == "paragraph_open":
+        content_text = _inline_text(tokens[i + 2])
+        j = st.close[i + 1]
+    bullet = "•" if st.list_stack and st.list_stack[-1] == "bullet_list_open" else "1."
+    indent = "    " * (len(st.list_stack) - 1)
+    p = parse_xml(_LI_TEMPLATE)
+    _w_r(p, f"{indent}{bullet} {content_text}")
+    st.body.append(p)
+    return j + 1
+
+
+def _handle_fence(tokens, i: int, st: _RenderState) -> int:
+    # 代码块
+    code_text = tokens[i].content.rstrip("\n")
+    p = _w_p(st.body)
+    if code_text:
+        _w_r(p, code_text, "Consolas")
+    return i + 1
 
-        # 其他 token：跳过
-        i += 1
+
+def _handle_blockquote(tokens, i: int, st: _RenderState) -> int:
+    # 简化：为引用增加前缀
+    j = st.close[i]
+    quote_lines = [tk.content for tk in tokens[i + 1:j] if tk.type == "inline" and tk.content]
+    for line in quote_lines:
+        _w_r(_w_p(st.body), f"> {line}")
+    return j + 1
+
+
+def _handle_hr(tokens, i: int, st: _RenderState) -> int:
+    _w_r(_w_p(st.body), "——————")
+    return i + 1
+
+
+# token 类型到处理函数的分派表；不在表中的 token 直接跳过
+_HANDLERS = {
+    "heading_open": _handle_heading,
+    "paragraph_open": _handle_paragraph,
+    "bullet_list_open": _handle_list_open,
+    "ordered_list_open": _handle_list_open,
+    "bullet_list_close": _handle_list_close,
+    "ordered_list_close": _handle_list_close,
+    "list_item_open": _handle_list_item,
+    "fence": _handle_fence,
+    "blockquote_open": _handle_blockquote,
+    "hr": _handle_hr,
+}
+
+
+def fallback_convert_with_python_docx(input_path: StrPath, output_docx_path: StrPath, header_text: Optional[str], cfg: Optional[Dict[str, Any]],
+                                      use_cache: bool = True) -> None:
+    _require_docx()
+    if markdown_it is None:
+        raise RuntimeError(
+            "缺少 markdown-it-py，请安装：pip install markdown-it-py"
+        )
+
+    tokens = _read_tokens(input_path, use_cache)
+    _reset_inline_cache()
+
+    doc = Document()
+    _apply_doc_defaults(doc, header_text, cfg)
+    body = doc.element.body
+    state = _RenderState(doc=doc, body=body, close=_match_close(tokens), list_stack=[], heading_ids={})
+
+    handlers = _HANDLERS
+    n = len(tokens)
+    i = 0
+    while i < n:
+        handler = handlers.get(tokens[i].type)
+        i = handler(tokens, i, state) if handler else i + 1
+
+    sect_pr = body.find(_W_SECT_PR)
+    if sect_pr is not None:
+        body.append(sect_pr)
 
     ensure_parent_dir(output_docx_path)
     doc.save(output_docx_path)
 
 
-def convert_docx_to_doc_with_libreoffice(input_docx: str, output_doc: str) -> bool:
-    soffice = which("soffice") or which("libreoffice")
+class _OfficeServer:
+    """常驻的无头 LibreOffice 进程，通过 UNO 连接复用，避免每个文件都启动一次 soffice。
+
+    需要 LibreOffice 的 Python 绑定（`uno` 模块）；使用独立的临时用户配置，
+    以免与用户正在运行的 LibreOffice 实例冲突。
+    """
+
+    def __init__(self, soffice: str, timeout: float = 30.0, verbose: bool = False) -> None:
+        import uno  # type: ignore
+
+        self._desktop = None
+        self._profile = tempfile.TemporaryDirectory(prefix="md2doc-lo-")
+        pipe_name = f"md2doc_{os.getpid()}"
+        self._proc = subprocess.Popen(
+            [
+                soffice,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                f"-env:UserInstallation={uno.systemPathToFileUrl(self._profile.name)}",
+                f"--accept=pipe,name={pipe_name};urp;",
+            ],
+            # 常驻进程的输出无人读取，用管道会在缓冲写满后阻塞；--verbose 时直接继承终端
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.DEVNULL,
+        )
+        atexit.register(self.close)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self._proc.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("LibreOffice 服务启动失败")
+                time.sleep(0.2)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    @staticmethod
+    def _props(**kwargs):
+        from com.sun.star.beans import PropertyValue  # type: ignore
+
+        props = []
+        for name, value in kwargs.items():
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            props.append(p)
+        return tuple(props)
+
+    def convert(self, input_docx: Path, output_doc: Path) -> None:
+        import uno  # type: ignore
+
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(input_docx)), "_blank", 0, self._props(Hidden=True)
+        )
+        try:
+            doc.storeToURL(
+                uno.systemPathToFileUrl(str(output_doc)),
+                self._props(FilterName="MS Word 97", Overwrite=True),
+            )
+        finally:
+            doc.close(True)
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def close(self) -> None:
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+            except Exception:
+                pass
+            self._desktop = None
+        if self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        self._profile.cleanup()
+
+
+_OFFICE: Optional[_OfficeServer] = None
+_OFFICE_UNAVAILABLE = False
+
+
+def _office_server(soffice: str, verbose: bool = False) -> Optional[_OfficeServer]:
+    """首次调用（或常驻进程已退出）时启动 LibreOffice；没有 UNO 绑定或启动失败时返回 None（改用命令行转换）。"""
+    global _OFFICE, _OFFICE_UNAVAILABLE
+    if _OFFICE is not None and _OFFICE.alive():
+        return _OFFICE
+    if _OFFICE is not None:
+        # 常驻进程已退出（崩溃或被杀），丢弃旧连接后重新启动
+        _OFFICE.close()
+        _OFFICE = None
+    if not _OFFICE_UNAVAILABLE:
+        try:
+            _OFFICE = _OfficeServer(soffice, verbose=verbose)
+        except Exception:
+            _OFFICE_UNAVAILABLE = True
+    return _OFFICE
+
+
+def convert_docx_to_doc_with_libreoffice(input_docx: StrPath, output_doc: StrPath, verbose: bool = False) -> bool:
+    soffice = _soffice()
     if not soffice:
         print("未找到 LibreOffice(soffice)，无法导出 .doc。已生成 .docx。", file=sys.stderr)
         return False
+    # main 传入的已是绝对路径，absolute() 此时不再访问文件系统
+    input_docx = Path(input_docx).absolute()
+    output_doc = Path(output_doc).absolute()
     ensure_parent_dir(output_doc)
+    server = _office_server(soffice, verbose)
+    if server is not None:
+        try:
+            server.convert(input_docx, output_doc)
+            return output_doc.exists()
+        except Exception as exc:
+            if server.alive():
+                print(f"LibreOffice 转换失败: {exc}", file=sys.stderr)
+                return False
+            # 常驻进程在转换中途退出：本文件改用命令行转换，下一个文件再重启服务
+            print(f"LibreOffice 服务已退出，改用命令行转换: {exc}", file=sys.stderr)
     try:
         # LibreOffice 会将结果输出到指定目录
-        out_dir = os.path.dirname(os.path.abspath(output_doc)) or os.getcwd()
-        subprocess.run(
+        out_dir = output_doc.parent
+        # soffice 的输出只在 --verbose 时才读取，否则直接丢弃，不在内存中缓冲
+        proc = subprocess.run(
             [
                 soffice,
                 "--headless",
                 "--convert-to",
                 "doc",
-                os.path.abspath(input_docx),
+                str(input_docx),
                 "--outdir",
-                out_dir,
+                str(out_dir),
             ],
             check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE if verbose else subprocess.DEVNULL,
+            stderr=subprocess.PIPE if verbose else subprocess.DEVNULL,
         )
+        if verbose:
+            for stream in (proc.stdout, proc.stderr):
+                text = stream.decode("utf-8", "replace").strip()
+                if text:
+                    print(f"[soffice] {text}", file=sys.stderr)
         # 转换后文件名与输入同名但扩展为 .doc
-        base = os.path.splitext(os.path.basename(input_docx))[0]
-        produced = os.path.join(out_dir, base + ".doc")
-        if produced != os.path.abspath(output_doc):
-            if os.path.exists(produced):
-                os.replace(produced, os.path.abspath(output_doc))
-        return os.path.exists(output_doc)
+        produced = out_dir / (input_docx.stem + ".doc")
+        if produced != output_doc:
+            if produced.exists():
+                os.replace(produced, output_doc)
+        return output_doc.exists()
     except subprocess.CalledProcessError as exc:
         print(f"LibreOffice 转换失败: {exc}", file=sys.stderr)
+        if verbose and exc.stderr:
+            print(exc.stderr.decode("utf-8", "replace").strip(), file=sys.stderr)
         return False
 
 
 @dataclass
 class Args:
-    input: str
+    inputs: List[str]
     output: Optional[str]
     header: Optional[str]
     config: Optional[str]
+    to: str = "docx"
+    no_cache: bool = False
+    jobs: Optional[int] = None
+    legacy_markdown: bool = False
+    verbose: bool = False
+    fast_doc: bool = False
 
 
 def parse_args(argv: List[str]) -> Args:
     parser = argparse.ArgumentParser(description="将 Markdown 转换为 .docx 或 .doc 文件")
-    parser.add_argument("input", help="输入 Markdown 文件路径")
-    parser.add_argument("-o", "--output", help="输出文件路径（.docx 或 .doc）")
+    parser.add_argument("inputs", nargs="+", metavar="input", help="输入 Markdown 文件路径（可多个）")
+    parser.add_argument("-o", "--output", help="输出文件路径（.docx 或 .doc）；多个输入时为输出目录")
+    parser.add_argument("-t", "--to", choices=("docx", "doc"), default="docx",
+                        help="未用 -o 指定文件名时的输出格式（默认 docx）")
     parser.add_argument("--header", help="页眉文本（默认不设置）")
     parser.add_argument("--config", help="样式配置文件（YAML 或 JSON）")
+    parser.add_argument("--no-cache", action="store_true", help="禁用 ~/.cache/md2doc 下的转换缓存")
+    parser.add_argument("-j", "--jobs", type=int, help="批量转换的并行进程数（默认 CPU 核数）")
+    parser.add_argument("--legacy-markdown", action="store_true",
+                        help="pandoc 使用旧版 markdown 读取器（支持表格标题，但病态输入下可能极慢）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出 LibreOffice 的运行日志")
+    parser.add_argument("--fast-doc", action="store_true",
+                        help="输出 .doc 时不调用 LibreOffice，直接把 .docx 改名为 .doc（内容仍为 OOXML）")
     ns = parser.parse_args(argv)
-    return Args(input=ns.input, output=ns.output, header=ns.header, config=ns.config)
+    return Args(inputs=ns.inputs, output=ns.output, header=ns.header, config=ns.config, to=ns.to,
+                no_cache=ns.no_cache, jobs=ns.jobs, legacy_markdown=ns.legacy_markdown,
+                verbose=ns.verbose, fast_doc=ns.fast_doc)
 
 
 def _load_config(path: Optional[str]) -> Optional[Dict[str, Any]]:
     if not path:
         return None
-    abs_path = os.path.abspath(path)
-    if not os.path.exists(abs_path):
+    abs_path = Path(path).absolute()
+    if not abs_path.exists():
         print(f"配置文件不存在：{abs_path}", file=sys.stderr)
         return None
     try:
-        if abs_path.lower().endswith((".yml", ".yaml")):
+        if abs_path.suffix.lower() in (".yml", ".yaml"):
             import yaml  # type: ignore
+            # 优先使用 libyaml 的 C 实现；未编译 libyaml 时退回纯 Python 的 SafeLoader
+            loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
             with open(abs_path, "r", encoding="utf-8") as f:
-                return yaml.safe_load(f) or {}
+                return yaml.load(f, Loader=loader) or {}
         else:
-            import json
-            with open(abs_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(abs_path, "rb") as f:
+                data = f.read()
+            try:
+                import orjson  # type: ignore
+            except ImportError:
+                return json.loads(data)
+            return orjson.loads(data)
     except Exception as exc:
         print(f"读取配置失败：{exc}", file=sys.stderr)
         return None
 
 
-def main(argv: List[str]) -> int:
-    args = parse_args(argv)
-    input_md = os.path.abspath(args.input)
-    if not os.path.exists(input_md):
-        print(f"找不到输入文件: {input_md}", file=sys.stderr)
-        return 2
-
-    if args.output:
-        output_path = os.path.abspath(args.output)
-        out_ext = os.path.splitext(output_path)[1].lower()
-    else:
-        base = os.path.splitext(os.path.basename(input_md))[0]
-        output_path = os.path.join(os.path.dirname(input_md), base + ".docx")
-        out_ext = ".docx"
-
-    # 先生成 docx
-    if out_ext == ".docx":
-        docx_target = output_path
-    elif out_ext == ".doc":
-        base = os.path.splitext(output_path)[0]
-        docx_target = base + ".docx"
-    else:
-        print("仅支持输出 .docx 或 .doc", file=sys.stderr)
-        return 2
-
-    # 载入配置
-    cfg = _load_config(args.config)
-
+def _convert_one(input_md: StrPath, docx_target: StrPath, header: Optional[str], cfg: Optional[Dict[str, Any]],
+                 use_cache: bool = True, legacy_markdown: bool = False) -> int:
+    """Markdown → .docx：优先 pandoc，失败回退 python-docx。作为顶层函数以便在工作进程中执行。"""
     # 尝试 pandoc
-    ok = convert_with_pandoc(input_md, docx_target, args.header, cfg)
+    ok = convert_with_pandoc(input_md, docx_target, header, cfg, use_cache, legacy_markdown)
     if not ok:
         # 回退方案
         try:
-            fallback_convert_with_python_docx(input_md, docx_target, args.header, cfg)
-            ok = True
+            fallback_convert_with_python_docx(input_md, docx_target, header, cfg, use_cache)
         except Exception as exc:
             print(f"回退转换失败: {exc}", file=sys.stderr)
             return 1
+    return 0
+
 
-    if out_ext == ".doc":
-        converted = convert_docx_to_doc_with_libreoffice(docx_target, output_path)
+def _finish_one(docx_target: Path, output_path: Path, verbose: bool = False, fast_doc: bool = False) -> int:
+    if output_path != docx_target and fast_doc:
+        # 不经 LibreOffice 转码：内容仍是 OOXML，只是以 .doc 扩展名保存
+        os.replace(docx_target, output_path)
+    elif output_path != docx_target:
+        converted = convert_docx_to_doc_with_libreoffice(docx_target, output_path, verbose)
         if converted:
             # 可选择保留中间 docx；这里保留，避免信息丢失
             pass
@@ -418,10 +1048,121 @@ def main(argv: List[str]) -> int:
             print("已生成 .docx，但 .doc 转换失败（需要 LibreOffice）", file=sys.stderr)
             return 3
 
-    print(f"转换完成: {output_path if out_ext == '.doc' else docx_target}")
+    print(f"转换完成: {output_path}")
     return 0
 
 
+def _init_worker(ref_docx: Dict[str, str]) -> None:
+    # 复用主进程已生成的 reference.docx，工作进程无需各自重建
+    _REF_DOCX.update(ref_docx)
+
+
+def _run_jobs(pairs: List[Tuple[StrPath, StrPath]], header: Optional[str], cfg: Optional[Dict[str, Any]],
+              use_cache: bool = True, jobs: Optional[int] = None, legacy_markdown: bool = False,
+              verbose: bool = False, fast_doc: bool = False) -> int:
+    rc = 0
+    todo: List[Tuple[Path, Path, Path]] = []
+    # 已被占用的输出路径（含 .doc 的中间 docx）→ 对应输入；同名输入写同一文件会互相覆盖
+    claimed: Dict[Path, Path] = {}
+    # 路径在此统一转为规范的绝对 Path，下游各步骤直接使用，不再重复 abspath/exists；
+    # 用 abspath 而非 Path.absolute()，以折叠 `..`，使 claimed 中同一文件只有一个键
+    # （不用 resolve()：它会把 /dev/fd/N 解析成不可打开的 pipe:[…]）
+    for input_md, output_path in pairs:
+        input_md = Path(os.path.abspath(input_md))
+        if not input_md.exists():
+            print(f"找不到输入文件: {input_md}", file=sys.stderr)
+            rc = max(rc, 2)
+            continue
+
+        output_path = Path(os.path.abspath(output_path))
+        out_ext = output_path.suffix.lower()
+
+        # 先生成 docx
+        if out_ext == ".docx":
+            docx_target = output_path
+        elif out_ext == ".doc":
+            docx_target = output_path.with_suffix(".docx")
+        else:
+            print("仅支持输出 .docx 或 .doc", file=sys.stderr)
+            rc = max(rc, 2)
+            continue
+        clash = next((p for p in (docx_target, output_path) if p in claimed), None)
+        if clash is not None:
+            print(f"输出文件冲突: {clash}（{claimed[clash]} 与 {input_md}），已跳过 {input_md}", file=sys.stderr)
+            rc = max(rc, 2)
+            continue
+        claimed[docx_target] = claimed[output_path] = input_md
+        todo.append((input_md, docx_target, output_path))
+
+    workers = min(jobs or os.cpu_count() or 1, len(todo))
+    if workers <= 1:
+        for input_md, docx_target, output_path in todo:
+            code = _convert_one(input_md, docx_target, header, cfg, use_cache, legacy_markdown)
+            rc = max(rc, code or _finish_one(docx_target, output_path, verbose, fast_doc))
+    else:
+        rc = max(rc, _run_pool(todo, workers, header, cfg, use_cache, legacy_markdown, verbose, fast_doc))
+
+    if use_cache:
+        _cache_prune()
+    return rc
+
+
+def _run_pool(todo: List[Tuple[Path, Path, Path]], workers: int, header: Optional[str],
+              cfg: Optional[Dict[str, Any]], use_cache: bool, legacy_markdown: bool, verbose: bool,
+              fast_doc: bool) -> int:
+    rc = 0
+    # 各文件相互独立，Markdown → .docx 并行；.doc 导出在主进程中按顺序进行，
+    # 共用同一个常驻 LibreOffice（UNO 服务一次只处理一个文档）
+    if _pandoc() is not None:
+        _reference_docx(header, cfg, use_cache)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dict(_REF_DOCX),)) as pool:
+        futures = [
+            pool.submit(_convert_one, input_md, docx_target, header, cfg, use_cache, legacy_markdown)
+            for input_md, docx_target, _ in todo
+        ]
+        for fut, (input_md, docx_target, output_path) in zip(futures, todo):
+            try:
+                code = fut.result()
+            except Exception as exc:
+                print(f"转换失败: {input_md}: {exc}", file=sys.stderr)
+                code = 1
+            rc = max(rc, code or _finish_one(docx_target, output_path, verbose, fast_doc))
+    return rc
+
+
+def _default_output(input_md: StrPath, output_dir: Optional[StrPath], to: str) -> Path:
+    input_md = Path(input_md).absolute()
+    return Path(output_dir or input_md.parent) / f"{input_md.stem}.{to}"
+
+
+def main_many(paths: List[str], output_dir: Optional[str] = None, to: str = "docx", header: Optional[str] = None,
+              cfg: Optional[Dict[str, Any]] = None, use_cache: bool = True, jobs: Optional[int] = None,
+              legacy_markdown: bool = False, verbose: bool = False, fast_doc: bool = False) -> int:
+    """批量转换，默认按 CPU 核数多进程并行。返回最差的退出码。"""
+    # 多个输入时 -o 只能是目录；看起来像输出文件的路径多半是误用，不要悄悄建成目录
+    if output_dir and (Path(output_dir).suffix.lower() in (".docx", ".doc") or os.path.isfile(output_dir)):
+        print(f"多个输入时 -o 应为输出目录，而不是文件: {output_dir}", file=sys.stderr)
+        return 2
+    pairs = [(path, _default_output(path, output_dir, to)) for path in paths]
+    return _run_jobs(pairs, header, cfg, use_cache, jobs, legacy_markdown, verbose, fast_doc)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    # 载入配置
+    cfg = _load_config(args.config)
+    use_cache = not args.no_cache
+
+    if len(args.inputs) > 1:
+        return main_many(args.inputs, args.output, args.to, args.header, cfg, use_cache, args.jobs,
+                         args.legacy_markdown, args.verbose, args.fast_doc)
+
+    output_path = args.output or _default_output(args.inputs[0], None, args.to)
+    return _run_jobs([(args.inputs[0], output_path)], args.header, cfg, use_cache,
+                     legacy_markdown=args.legacy_markdown, verbose=args.verbose, fast_doc=args.fast_doc)
+
+
 if __name__ == "__main__":
     raise SystemExit(main(sys.argv[1:]))
 